@@ -0,0 +1,114 @@
+# Imports
+# sys: Command line arguments (corpus path and language name)
+# mmap: Maps the corpus into memory so arbitrarily large files are read in chunks by the OS
+# unicodedata: Decomposes accented characters to fold them into plain ascii letters
+# numpy: Vectorized counting (bincount) and the binary model files (.npy)
+import sys
+import mmap
+import unicodedata
+import numpy as np
+
+# Default chunk size (in bytes) read from the mapped corpus at a time
+CHUNK_SIZE = 1 << 22
+
+# Model files generated for each n-gram order, relative to the src folder
+MODEL_FILES = {
+    1: '../frequencies/{language}.npy',
+    2: '../frequencies/{language}_bigrams.npy',
+    3: '../frequencies/{language}_trigrams.npy'
+}
+
+
+# Builds a translation table that folds accented latin letters into their ascii base letter (e.g. 'ç' -> 'c', 'ã' -> 'a')
+def accent_table():
+    table = {}
+
+    # Latin-1 Supplement and Latin Extended-A/B cover the accents of both portuguese and english texts
+    for code in range(0x00C0, 0x0250):
+        base = unicodedata.normalize('NFKD', chr(code))[0]
+        if base.isascii() and base.isalpha():
+            table[code] = base
+
+    return str.maketrans(table)
+
+
+# Returns the end of a chunk moved forward so a multibyte utf-8 character is never split in half
+def chunk_end(data, end):
+    # utf-8 continuation bytes always start with the bits 10
+    while end < len(data) and (data[end] & 0xC0) == 0x80:
+        end += 1
+
+    return end
+
+
+# Converts a chunk of the corpus into an array of letter indexes (A = 0 ... Z = 25), ignoring everything else
+def letter_indexes(chunk, table):
+    text = chunk.decode('utf-8', errors='ignore').translate(table).upper()
+    codes = np.frombuffer(text.encode('ascii', errors='ignore'), dtype=np.uint8)
+
+    return codes[(codes >= ord('A')) & (codes <= ord('Z'))].astype(np.int64) - ord('A')
+
+
+# Counts the unigram, bigram and trigram frequencies of a corpus without loading it whole into memory
+def count_ngrams(corpus_path, chunk_size=CHUNK_SIZE):
+    table = accent_table()
+    counts = {
+        1: np.zeros(26, dtype=np.int64),
+        2: np.zeros(26 ** 2, dtype=np.int64),
+        3: np.zeros(26 ** 3, dtype=np.int64)
+    }
+
+    # Last two letters of the previous chunk, so n-grams crossing a chunk border are still counted
+    tail = np.zeros(0, dtype=np.int64)
+
+    with open(corpus_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < len(data):
+            end = chunk_end(data, min(start + chunk_size, len(data)))
+            letters = letter_indexes(data[start:end], table)
+            start = end
+
+            counts[1] += np.bincount(letters, minlength=26)
+
+            # n-grams are encoded as base 26 numbers so they can be counted with a single bincount
+            # (bigrams only need the last letter of the previous chunk, or the first one would be counted twice)
+            window = np.concatenate((tail, letters))
+            pairs = window[max(len(tail) - 1, 0):]
+            if len(pairs) >= 2:
+                counts[2] += np.bincount(pairs[:-1] * 26 + pairs[1:], minlength=26 ** 2)
+            if len(window) >= 3:
+                counts[3] += np.bincount(window[:-2] * 26 ** 2 + window[1:-1] * 26 + window[2:], minlength=26 ** 3)
+
+            tail = window[-2:]
+
+    return counts
+
+
+# Turns n-gram counts into frequencies, using add-one smoothing so no frequency is zero (chi-squared divides by it)
+def frequencies(counts, order):
+    smoothed = counts.astype(np.float64) + 1
+
+    return (smoothed / smoothed.sum()).reshape((26,) * order)
+
+
+# Trains the language models from a corpus and saves them as .npy files, loadable with numpy.load(mmap_mode='r')
+def train(corpus_path, language, chunk_size=CHUNK_SIZE):
+    counts = count_ngrams(corpus_path, chunk_size)
+
+    if counts[1].sum() == 0:
+        raise ValueError('Corpus has no letters')
+
+    for order, path in MODEL_FILES.items():
+        np.save(path.format(language=language), frequencies(counts[order], order))
+
+    return counts[1].sum()
+
+
+# Main function, trains the models of a language from the given corpus
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Uso: python trainer.py <corpus> <linguagem>')
+        exit(1)
+
+    letters = train(sys.argv[1], sys.argv[2])
+    print(f'Modelos de {sys.argv[2]} gerados a partir de {letters} letras.')
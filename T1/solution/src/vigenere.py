@@ -1,8 +1,19 @@
 # Imports
 # re: Regular expressions used to match non alpha-ascii characters and clean up the message
 # functools: Reduce used on several lists to help calculate sums
+# logging: Structured timings of the recovery when metrics are enabled (METRICS=1)
+# metrics: Opt-in counters and latency histograms
+# os: Checks whether a trained (binary) model exists for a language
+# mmap: Maps large cyphered files into memory so only the sampled part is read for the key recovery
+import os
+import mmap
 import re
 import functools
+import logging
+import metrics
+
+# Chunk size (in bytes) used when streaming the decryption of a file
+CHUNK_SIZE = 1 << 20
 
 
 # Encrypts/decrypts a given plain text using a key through Vigenere's cypher
@@ -44,10 +55,20 @@ def vigenere(raw_text, raw_key, operation):
 
 
 # Recovers a Vigenere's cypher key using frequency analysis
+@metrics.timed('recover')
 def recover(raw_text, max_key_length, language='english'):
     # Trims the text from non-cyphered characters
     slim = re.sub('[^a-zA-Z]+', '', raw_text).upper()
 
+    key = recover_key(slim, max_key_length, language)
+
+    # Return the key and deciphered message
+    message = vigenere(raw_text, key, 'decrypt')
+    return key, message
+
+
+# Recovers the key from a text already trimmed to upper case letters
+def recover_key(slim, max_key_length, language='english'):
     # Estimates key length
     key_len = estimate_key_length(slim, max_key_length)
 
@@ -65,13 +86,66 @@ def recover(raw_text, max_key_length, language='english'):
     for value in shifted_coset:
         key += chr(ord('A') + value)
 
-    # Return the key and deciphered message
-    message = vigenere(raw_text, key, 'decrypt')
-    return key, message
+    return key
+
+
+# Recovers the key of a (possibly very large) cyphered file from a sample of its beginning
+# The sample doubles in size until the recovered key stays the same for stable_rounds samples in a row,
+# so the cost of the analysis depends on the key length and not on the size of the file.
+# Only the decryption goes through the whole file, in chunks, into output_path.
+@metrics.timed('recover_file')
+def recover_file(path, max_key_length, language='english', output_path=None, stable_rounds=3, sample_size=4096):
+    output_path = output_path if output_path else f'{path}.decrypted'
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        key = None
+        stable = 0
+
+        while True:
+            # The sample is always a prefix of the file, keeping its letters aligned with the key
+            sample = data[:sample_size].decode('ascii', errors='ignore')
+            slim = re.sub('[^a-zA-Z]+', '', sample).upper()
+
+            # Each co-set needs at least 2 letters for its index of coincidence
+            if len(slim) >= 2 * max_key_length or sample_size >= len(data):
+                sample_key = recover_key(slim, max_key_length, language)
+                metrics.count('recover_file_samples')
+
+                stable = stable + 1 if sample_key == key else 1
+                key = sample_key
+
+            # Stops when the key is stable or the whole file was already analyzed
+            if stable >= stable_rounds or sample_size >= len(data):
+                break
+
+            sample_size *= 2
+
+        metrics.count('recover_file_sampled_bytes', min(sample_size, len(data)))
+
+        # Streams the decryption through the file, rotating the key by the number of letters already deciphered
+        with open(output_path, 'w') as output:
+            offset = 0
+            start = 0
+            while start < len(data):
+                end = min(start + CHUNK_SIZE, len(data))
+
+                # Never split a multibyte utf-8 character (continuation bytes start with the bits 10)
+                while end < len(data) and (data[end] & 0xC0) == 0x80:
+                    end += 1
+
+                message = vigenere(data[start:end].decode('utf-8', errors='ignore'),
+                                   key[offset:] + key[:offset], 'decrypt')
+                output.write(message)
+
+                offset = (offset + len(re.findall('[A-Z]', message))) % len(key)
+                start = end
+
+    return key, output_path
 
 
 # Returns the estimated key length for a given text
 # based on which co-set length displays the highest index of coincidence
+@metrics.timed('estimate_key_length')
 def estimate_key_length(cypher_text, max_length):
     index_array = [0] * max_length
     coincidence_indexes = []
@@ -97,6 +171,7 @@ def estimate_key_length(cypher_text, max_length):
 
 # Split the cypher text into a given number of groups with the letters
 # distributed uniformly in a sequential and round-robin fashion
+@metrics.timed('cosets')
 def cosets(text, num):
     # Matrix of sets
     sets = [[] for _ in range(num)]
@@ -137,10 +212,26 @@ def frequency_count(coset):
     return counts
 
 
-# Computes the shift of a coset by finding the smallest chi-squared test
-# against the actual frequency of letters in the alphabet.
-# Reference: https://pages.mtu.edu/~shene/NSF-4/Tutorial/VIG/Vig-Recover.html
-def coset_shift(coset, language):
+# Loads the model of a given n-gram order trained by trainer.py (memory-mapped, nothing is parsed)
+# Returns None if no model was trained for the language
+@functools.lru_cache(maxsize=None)
+def load_model(language, order=1):
+    # Imported here so numpy is only required when trained models are used
+    from trainer import MODEL_FILES
+    path = MODEL_FILES[order].format(language=language)
+    if not os.path.exists(path):
+        return None
+
+    import numpy as np
+    return np.load(path, mmap_mode='r')
+
+
+# Returns the letter frequency of a language, preferring the trained model over the hand-maintained list
+@functools.lru_cache(maxsize=None)
+def load_frequencies(language):
+    if os.path.exists(f'../frequencies/{language}.npy'):
+        return load_model(language, 1).tolist()
+
     freq = []
     if language == 'english':
         # English letter frequency
@@ -151,6 +242,16 @@ def coset_shift(coset, language):
         for line in open("../frequencies/portuguese.txt", "r").readlines():
             freq.append(float(line))
 
+    return freq
+
+
+# Computes the shift of a coset by finding the smallest chi-squared test
+# against the actual frequency of letters in the alphabet.
+# Reference: https://pages.mtu.edu/~shene/NSF-4/Tutorial/VIG/Vig-Recover.html
+@metrics.timed('coset_shift')
+def coset_shift(coset, language):
+    freq = load_frequencies(language)
+
     index_array = [0] * 26
 
     chi = []
@@ -185,6 +286,9 @@ def coset_shift(coset, language):
 if __name__ == '__main__':
     user_input = 0
 
+    if metrics.enabled:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # Main loop
     while not user_input:
         # Main menu
@@ -192,7 +296,8 @@ if __name__ == '__main__':
         print('1 - Encryptar')
         print('2 - Decryptar')
         print('3 - Recuperar chave')
-        print('4 - Sair')
+        print('4 - Recuperar chave de arquivo')
+        print('5 - Sair')
         user_input = input('Opção:')
         print('')
 
@@ -221,15 +326,33 @@ if __name__ == '__main__':
                 plain_key_length = int(input('Digite o tamanho máximo da chave:'))
                 plain_language = input('[Opcional] Linguagem da mensagem (english/portuguese) {Default = ENGLISH}:')
                 plain_language = plain_language if plain_language != '' else 'english'
-                recovered_key, result = recover(plain_text, plain_key_length, plain_language)
+                with metrics.Stage('recover', language=plain_language, length=len(plain_text)):
+                    recovered_key, result = recover(plain_text, plain_key_length, plain_language)
                 print('Chave encontrada:')
                 print(f'{recovered_key}')
                 print('Mensagem decriptada:')
                 print(f'{result}')
                 print('')
                 user_input = 0
-            # Exit program
+            # Recover key from a (large) file
             case '4':
+                plain_path = input('Digite o caminho do arquivo a ser analisado:')
+                plain_key_length = int(input('Digite o tamanho máximo da chave:'))
+                plain_language = input('[Opcional] Linguagem da mensagem (english/portuguese) {Default = ENGLISH}:')
+                plain_language = plain_language if plain_language != '' else 'english'
+                with metrics.Stage('recover_file', language=plain_language, path=plain_path):
+                    recovered_key, result = recover_file(plain_path, plain_key_length, plain_language)
+                print('Chave encontrada:')
+                print(f'{recovered_key}')
+                print('Mensagem decriptada salva em:')
+                print(f'{result}')
+                print('')
+                user_input = 0
+            # Exit program
+            case '5':
+                # Save the collected metrics (metrics.json and metrics.prom)
+                if metrics.enabled:
+                    metrics.export_files('./metrics')
                 exit(0)
             # Default (invalid option)
             case _:
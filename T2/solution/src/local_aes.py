@@ -1,6 +1,7 @@
 import os
 import string
 import random
+import metrics
 
 
 # A counter object used to keep track of the value used by the AES CTR encryption / decryption
@@ -52,11 +53,14 @@ def aes_generate_symmetric_key_file(name: str, key_size: int) -> str:
 
 
 # Since AES is symmetric, the same process is used to encrypt / decrypt messages
+@metrics.timed('aes_process')
 def aes_process(plaintext: bytes, key: bytes) -> bytes:
     # The key length is important here
     if len(key) not in (16, 24, 32):
         raise ValueError('Invalid key size')
 
+    metrics.count('aes_process_bytes', len(plaintext))
+
     counter = Counter()
     remaining_counter = []
 
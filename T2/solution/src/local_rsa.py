@@ -3,6 +3,7 @@ import random
 import base64
 import hashlib
 from math import ceil
+import metrics
 
 
 # Returns the greatest common divisor of both a and b (Euclid's Algorithm)
@@ -75,10 +76,15 @@ def is_prime(num: int) -> bool:
     # See if any of the low prime numbers can divide the provided number
     for prime in low_primes:
         if num % prime == 0:
+            metrics.count('is_prime_rejected_low_primes')
             return False
 
     # rabin_miller() is finally called to determine if the provided number is prime
-    return rabin_miller(num)
+    if not rabin_miller(num):
+        metrics.count('is_prime_rejected_rabin_miller')
+        return False
+
+    return True
 
 
 # Return a (pseudo) random number of keysize bits in size
@@ -87,8 +93,10 @@ def generate_large_number(keysize: int = 1024) -> int:
 
 
 # Return a random prime number of keysize bits in size
+@metrics.timed('generate_large_prime')
 def generate_large_prime(keysize: int = 1024) -> int:
     while True:
+        metrics.count('generate_large_prime_attempts')
         num = generate_large_number(keysize)
         if is_prime(num):
             return num
@@ -178,6 +186,7 @@ def xor(data: bytes, mask: bytes) -> bytes:
 
 
 # Apply optimal asymmetric encryption padding encoding to message
+@metrics.timed('oaep_encode')
 def oaep_encode(message: bytes, key_length: int) -> bytes:
     label_hash = sha1(b'')
     hash_length = len(label_hash)
@@ -194,6 +203,7 @@ def oaep_encode(message: bytes, key_length: int) -> bytes:
 
 
 # Remove optimal asymmetric encryption padding encoding from message
+@metrics.timed('oaep_decode')
 def oaep_decode(message: bytes, key_length: int) -> bytes:
     label_hash = sha1(b'')
     hash_length = len(label_hash)
@@ -217,6 +227,7 @@ def oaep_decode(message: bytes, key_length: int) -> bytes:
 
 
 # Encrypt message using RSA public key
+@metrics.timed('rsa_pow')
 def encrypt(message: int, public_key: (int, int, int)) -> int:
     _, n, e = public_key
 
@@ -224,6 +235,7 @@ def encrypt(message: int, public_key: (int, int, int)) -> int:
 
 
 # Encrypt message using RSA private key
+@metrics.timed('rsa_pow')
 def decrypt(cipher: int, private_key: (int, int, int)) -> int:
     _, n, d = private_key
 
@@ -1,6 +1,8 @@
 # Imports
 import os
 import base64
+import logging
+import metrics
 from local_aes import aes_process, aes_generate_symmetric_key_file
 from local_rsa import rsa_encrypt_oaep, rsa_decrypt_oaep, rsa_sign, rsa_check_sign, rsa_generate_asymmetric_key_files
 
@@ -110,22 +112,34 @@ if __name__ == '__main__':
     os.makedirs('./output/messages', exist_ok=True)
     os.makedirs('./output/keys', exist_ok=True)
 
+    # Structured session timings (METRICS=1)
+    if metrics.enabled:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # Start communication session
     input("Pressione ENTER para iniciar sessão")
 
-    sender_stage_1()
+    with metrics.Stage('sender_stage_1'):
+        sender_stage_1()
 
     input("Pressione ENTER para seguir o fluxo")
 
-    receiver_stage_1()
+    with metrics.Stage('receiver_stage_1'):
+        receiver_stage_1()
 
     input("Pressione ENTER para seguir o fluxo")
 
-    sender_stage_2()
+    with metrics.Stage('sender_stage_2'):
+        sender_stage_2()
 
     input("Pressione ENTER para seguir o fluxo")
 
-    receiver_stage_2()
+    with metrics.Stage('receiver_stage_2'):
+        receiver_stage_2()
+
+    # Save the collected metrics (output/metrics.json and output/metrics.prom)
+    if metrics.enabled:
+        metrics.export_files('./output/metrics')
 
     # End communication session
     input("Pressione ENTER para finalizar sessão")
@@ -0,0 +1,160 @@
+# Imports
+# os: Reads the METRICS environment variable that turns the instrumentation on
+# time: Monotonic clock used to measure the latency of each instrumented call
+# json: Export format for the collected metrics and the structured session logs
+# logging: Structured (one JSON object per line) session timings
+# functools: Keeps the name and docstring of instrumented functions
+import os
+import time
+import json
+import logging
+import functools
+
+# Instrumentation is opt-in: export METRICS=1 (or call enable()) to start collecting
+enabled = os.environ.get('METRICS', '') not in ('', '0')
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last one catches everything else
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+# Collected values, indexed by metric name
+counters = {}
+histograms = {}
+
+logger = logging.getLogger('metrics')
+
+
+# Turns the instrumentation on or off at runtime
+def enable(value: bool = True) -> None:
+    global enabled
+    enabled = value
+
+
+# Clears every collected value
+def reset() -> None:
+    counters.clear()
+    histograms.clear()
+
+
+# Increments a counter by the given amount
+def count(name: str, amount: int = 1) -> None:
+    if not enabled:
+        return
+
+    counters[name] = counters.get(name, 0) + amount
+
+
+# Records a latency sample (in seconds) into the histogram of the given name
+def observe(name: str, seconds: float) -> None:
+    if not enabled:
+        return
+
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+
+    # Buckets are not cumulative here, the Prometheus export accumulates them
+    for index, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            histogram['buckets'][index] += 1
+            break
+
+    histogram['count'] += 1
+    histogram['sum'] += seconds
+
+
+# Decorator that counts the calls and records the latency of a function under the given name
+def timed(name: str):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Disabled: a single flag check is the whole cost
+            if not enabled:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+                count(f'{name}_calls')
+
+        return wrapper
+
+    return decorator
+
+
+# Context manager that times a block of code and emits it as a structured log line
+class Stage(object):
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not enabled:
+            return False
+
+        elapsed = time.perf_counter() - self.start
+        observe(f'stage_{self.name}', elapsed)
+        logger.info(json.dumps({
+            'event': 'stage',
+            'stage': self.name,
+            'seconds': round(elapsed, 6),
+            'ok': exc_type is None,
+            **self.fields
+        }))
+
+        return False
+
+
+# Returns the collected metrics as a JSON document
+def export_json() -> str:
+    return json.dumps({
+        'counters': counters,
+        'histograms': {
+            name: {
+                'buckets': {str(bound): value for bound, value in zip(BUCKETS, histogram['buckets'])},
+                'count': histogram['count'],
+                'sum': histogram['sum']
+            }
+            for name, histogram in histograms.items()
+        }
+    }, indent=2)
+
+
+# Returns the collected metrics in the Prometheus text exposition format
+def export_prometheus() -> str:
+    lines = []
+
+    for name, value in sorted(counters.items()):
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value}')
+
+    for name, histogram in sorted(histograms.items()):
+        metric = f'{name}_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+
+        # Prometheus buckets are cumulative
+        cumulative = 0
+        for bound, value in zip(BUCKETS, histogram['buckets']):
+            cumulative += value
+            label = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{metric}_bucket{{le="{label}"}} {cumulative}')
+
+        lines.append(f'{metric}_sum {histogram["sum"]}')
+        lines.append(f'{metric}_count {histogram["count"]}')
+
+    return "\n".join(lines) + "\n"
+
+
+# Saves both exports next to each other (<path>.json and <path>.prom)
+def export_files(path: str) -> None:
+    with open(f'{path}.json', 'w') as f:
+        f.write(export_json())
+
+    with open(f'{path}.prom', 'w') as f:
+        f.write(export_prometheus())